@@ -0,0 +1,29 @@
+# build_chapters.py
+# Build step: download every MPEP chapter PDF and ship its extracted text as
+# chapters/<pdf name>.txt.gz, so the app never has to fetch or parse PDFs at query time.
+# Re-run whenever the USPTO publishes a new MPEP revision.
+#
+# Usage: python build_chapters.py
+
+import gzip
+import os
+
+import requests
+
+from mpep_corpus import chapter_asset_dir, chapter_asset_path, chapter_to_url, extract_pdf_text
+
+
+def main():
+    os.makedirs(chapter_asset_dir, exist_ok=True)
+    session = requests.Session()
+    for chapter, url in chapter_to_url.items():
+        print(f"📄 {chapter}")
+        response = session.get(url, timeout=(5, 60))
+        response.raise_for_status()
+        text = extract_pdf_text(response.content)
+        with gzip.open(chapter_asset_path(url), "wt", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
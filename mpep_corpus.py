@@ -0,0 +1,214 @@
+# mpep_corpus.py
+# MPEP chapter sources and PDF text extraction, shared by the app and build_chapters.py
+
+import gzip
+import os
+import re
+
+# --- Hardcoded MPEP Chapters (Official USPTO PDFs) ---
+chapter_to_url = {
+    'Chapter 0 – Table of Contents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0000-table-of-contents.pdf',
+    'Chapter 20 – Introduction': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0020-introduction.pdf',
+    'Chapter 100 – Secrecy, Access, National Security, and Foreign Filing': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0100.pdf',
+    'Chapter 200 – Types and Status of Application; Benefit and Priority Claims': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0200.pdf',
+    'Chapter 300 – Ownership and Assignment': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0300.pdf',
+    'Chapter 400 – Representative of Applicant or Owner': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0400.pdf',
+    'Chapter 500 – Receipt and Handling of Mail and Papers': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0500.pdf',
+    'Chapter 600 – Parts, Form, and Content of Application': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0600.pdf',
+    'Chapter 700 – Examination of Applications': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0700.pdf',
+    'Chapter 800 – Restriction in Applications Filed Under 35 U.S.C. 111; Double Patenting': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0800.pdf',
+    'Chapter 900 – Prior Art, Search, Classification, and Routing': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0900.pdf',
+    'Chapter 1000 – Matters Decided by Various U.S. Patent and Trademark Office Officials': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1000.pdf',
+    'Chapter 1100 – Statutory Invention Registration (SIR); Pre-Grant Publication (PGPub) and Preissuance Submissions': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1100.pdf',
+    'Chapter 1200 – Appeal': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1200.pdf',
+    'Chapter 1300 – Allowance and Issue': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1300.pdf',
+    'Chapter 1400 – Correction of Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1400.pdf',
+    'Chapter 1500 – Design Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1500.pdf',
+    'Chapter 1600 – Plant Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1600.pdf',
+    'Chapter 1700 – Miscellaneous': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1700.pdf',
+    'Chapter 1800 – Patent Cooperation Treaty': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1800.pdf',
+    'Chapter 1900 – Protest': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1900.pdf',
+    'Chapter 2000 – Duty of Disclosure': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2000.pdf',
+    'Chapter 2100 – Patentability': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2100.pdf',
+    'Chapter 2200 – Citation of Prior Art and Ex Parte Reexamination of Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2200.pdf',
+    'Chapter 2300 – Interference and Derivation Proceedings': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2300.pdf',
+    'Chapter 2400 – Biotechnology': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2400.pdf',
+    'Chapter 2500 – Maintenance Fees': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2500.pdf',
+    'Chapter 2600 – Optional Inter Partes Reexamination': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2600.pdf',
+    'Chapter 2700 – Patent Terms, Adjustments, and Extensions': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2700.pdf',
+    'Chapter 2800 – Supplemental Examination': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2800.pdf',
+    'Chapter 2900 – International Design Applications': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2900.pdf',
+    'Chapter 9005 – Appendix I – Reserved': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9005-appx-i.pdf',
+    'Chapter 9010 – Appendix II – List of Decisions Cited': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9010-appx-ii.pdf',
+    'Chapter 9015 – Appendix L – Patent Laws': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9015-appx-l.pdf',
+    'Chapter 9020 – Appendix R – Patent Rules': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9020-appx-r.pdf',
+    'Chapter 9025 – Appendix T – Patent Cooperation Treaty': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9025-appx-t.pdf',
+    'Chapter 9030 – Appendix AI – Administrative Instructions Under the PCT': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9030-appx-ai.pdf',
+    'Chapter 9035 – Appendix P – Paris Convention': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9035-appx-p.pdf',
+    'Chapter 9090 – Subject Matter Index': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9090-subject-matter-index.pdf',
+    'Chapter 9095 – Form Paragraphs': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9095-Form-Paragraph-Chapter.pdf'
+}
+
+
+# --- Chapter Index ---
+# Derived once per process on import, not on every Streamlit rerun
+chapter_names = list(chapter_to_url.keys())
+# "2100" -> "Chapter 2100 – Patentability"
+code_to_chapter = {name.split(" – ", 1)[0].split()[-1]: name for name in chapter_names}
+
+
+# --- Chapter Auto-Suggestion Keywords ---
+keyword_to_code = {
+    # --- Patentability & Rejections ---
+    "101": "2100",
+    "section 101": "2100",
+    "section 102": "2100",
+    "section 103": "2100",
+    "35 usc 102": "2100",
+    "35 usc 103": "2100",
+    "obviousness": "2100",
+    "non-obvious": "2100",
+    "novelty": "2100",
+    "enablement": "2100",
+    "written description": "2100",
+    "best mode": "2100",
+    "utility": "2100",
+    "abstract idea": "2100",
+    "statutory subject matter": "2100",
+    "algorithm": "2100",
+    "103 rejection": "2100",
+    "102 rejection": "2100",
+
+    # --- Examination ---
+    "office action": "700",
+    "final rejection": "700",
+    "non-final rejection": "700",
+    "amendment": "700",
+    "examination": "700",
+    "reply brief": "700",
+    "interview": "700",
+
+    # --- Filing and Specification ---
+    "claims": "600",
+    "abstract": "600",
+    "drawings": "600",
+    "specification": "600",
+
+    # --- Restriction & Double Patenting ---
+    "restriction requirement": "800",
+    "double patenting": "800",
+    "generic claim": "800",
+    "unity of invention": "800",
+
+    # --- Application Types ---
+    "continuation": "200",
+    "continuation-in-part": "200",
+    "divisional": "200",
+    "provisional application": "200",
+    "priority claim": "200",
+
+    # --- Appeals ---
+    "appeal": "1200",
+    "ptab": "1200",
+    "board of appeals": "1200",
+    "rehearing": "1200",
+    "pre-appeal": "1200",
+
+    # --- Disclosure Requirements ---
+    "ids": "2000",
+    "information disclosure statement": "2000",
+    "duty of disclosure": "2000",
+    "rule 56": "2000",
+
+    # --- Prior Art & Reexamination ---
+    "prior art": "2200",
+    "non-patent literature": "2200",
+    "reexamination": "2200",
+    "ex parte": "2200",
+
+    # --- International Filing ---
+    "pct": "1800",
+    "pct application": "1800",
+    "foreign filing": "1800",
+    "foreign filing license": "1800",
+    "wipo": "1800",
+    "national phase": "1800",
+    "international phase": "1800",
+
+    # --- Design & Plant Patents ---
+    "design patent": "1500",
+    "ornamental": "1500",
+    "plant patent": "1600",
+
+    # --- Correction & Reissue ---
+    "reissue": "1400",
+    "re-issue": "1400",
+
+    # --- Assignments ---
+    "assignment": "300",
+    "ownership": "300",
+    "change of ownership": "300",
+
+    # --- Representation & Power of Attorney ---
+    "power of attorney": "400",
+    "attorney": "400",
+    "attorney of record": "400",
+
+    # --- Secrecy & National Security ---
+    "secrecy order": "100",
+    "classified": "100",
+    "access to application": "100",
+
+    # --- Biotechnology ---
+    "deposit": "2400",
+    "biological material": "2400",
+
+    # --- Publication & Pre-Grant Disclosure ---
+    "publication": "1100",
+    "pre-grant": "1100",
+    "sir": "1100",
+
+    # --- Protests & Petitions ---
+    "protest": "1900",
+    "petition": "1000",
+
+    # --- Fees ---
+    "maintenance fee": "2500",
+    "fee payment": "2500",
+    "late fee": "2500",
+
+    # --- Misc & Index ---
+    "subject matter index": "9090"
+}
+
+# One alternation over every keyword (longest first) so detection is a single pass.
+# Keywords must start a word ("sir" should not fire on "desire") but may be pluralised.
+keyword_pattern = re.compile(
+    r"\b(?:" + "|".join(re.escape(k) for k in sorted(keyword_to_code, key=len, reverse=True)) + ")",
+    re.IGNORECASE | re.ASCII
+)
+
+
+# --- Pre-extracted Chapter Text ---
+# build_chapters.py writes one chapters/<pdf name>.txt.gz per chapter; when present the
+# app reads it instead of downloading and parsing the PDF
+chapter_asset_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chapters")
+
+def extract_pdf_text(data):
+    # Imported here so an app serving shipped text assets never loads PyMuPDF
+    import fitz  # PyMuPDF
+
+    # PyMuPDF reads the bytes directly; no BytesIO copy needed
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return "\n".join(page.get_text("text") for page in doc)
+
+def chapter_asset_path(url):
+    name = os.path.splitext(os.path.basename(url))[0]
+    return os.path.join(chapter_asset_dir, f"{name}.txt.gz")
+
+def load_chapter_asset(url):
+    path = chapter_asset_path(url)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return f.read()
@@ -3,35 +3,77 @@
 # === Part 1: Setup and Imports ===
 
 import streamlit as st
-import requests
-import fitz  # PyMuPDF
-from io import BytesIO
 import os
 import re
 import json
 import base64
-from datetime import datetime
-from thefuzz import fuzz
-from sentence_transformers import SentenceTransformer, util
+import bisect
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sentence_transformers import SentenceTransformer
+from huggingface_hub import InferenceClient
 import torch
+import numpy as np
 import requests
+import requests_cache
+import diskcache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from streamlit_lottie import st_lottie
+from mpep_corpus import (
+    chapter_names, chapter_to_url, code_to_chapter, keyword_pattern, keyword_to_code,
+    extract_pdf_text, load_chapter_asset
+)
 
 # --- Page Configuration ---
 st.set_page_config(page_title="MPEdge", layout="wide")
 
+# --- HTTP Session ---
+# One keep-alive session for every outbound request. Static downloads (MPEP PDFs,
+# animations) are also cached on disk so cold starts revalidate instead of re-downloading;
+# POSTs are never cached.
+@st.cache_resource
+def get_http_session():
+    session = requests_cache.CachedSession(
+        "mpep_http_cache",
+        backend="sqlite",
+        expire_after=timedelta(days=7),
+        stale_if_error=True
+    )
+    # Pool enough keep-alive connections for the parallel chapter fetches, and retry
+    # dropped connections (urllib3 does not retry POSTs, so LLM calls are never repeated)
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=Retry(total=3, backoff_factor=0.3))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# (connect, read) timeouts in seconds, so a stalled server can't hang the script run;
+# LLM calls get a longer read timeout because free-tier generations can be slow
+download_timeout = (5, 60)
+llm_timeout = (5, 120)
+
+# Runs at the top of every rerun; fetch and parse the animation once per day instead
+@st.cache_data(ttl=timedelta(days=1), show_spinner=False)
 def load_lottie_url(url):
-    r = requests.get(url)
-    if r.status_code != 200:
+    # The animation is decorative; a short timeout and no animation beat a crashed page
+    try:
+        r = get_http_session().get(url, timeout=(3, 5))
+        if r.status_code != 200:
+            return None
+        return r.json()
+    except requests.RequestException:
         return None
-    return r.json()
 
 # Example Lottie animation (a robot waving)
 lottie_url = "https://assets1.lottiefiles.com/packages/lf20_jcikwtux.json"
 lottie_json = load_lottie_url(lottie_url)
 
 # Show it in the app
-st_lottie(lottie_json, height=300, key="robot")
+if lottie_json is not None:
+    st_lottie(lottie_json, height=300, key="robot")
 
 theme_choice = st.radio("🎨 Choose a Theme", ["Light", "Dark", "Fun"], horizontal=True)
 
@@ -69,9 +111,13 @@ st.markdown("""
 
 
 # --- Load Embedder Model ---
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+embedder_name = "all-MiniLM-L6-v2"
+
 @st.cache_resource(show_spinner="🔌 Loading embedding model...")
 def load_embedder():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+    return SentenceTransformer(embedder_name, device=device)
 
 model = load_embedder()
 
@@ -85,6 +131,9 @@ if "last_query" not in st.session_state:
 if "last_answer" not in st.session_state:
     st.session_state["last_answer"] = None
 
+if "answer_cache" not in st.session_state:
+    st.session_state["answer_cache"] = []
+
 # === Part 2: Logo, Page Setup, and UI Theme ===
 
 # --- Header with Logo ---
@@ -104,212 +153,164 @@ st.markdown("AI-powered search and analysis of the MPEP (Manual of Patent Examin
 
 
 
-# --- Hardcoded MPEP Chapters (Official USPTO PDFs) ---
-chapter_to_url = {
-    'Chapter 0 – Table of Contents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0000-table-of-contents.pdf',
-    'Chapter 20 – Introduction': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0020-introduction.pdf',
-    'Chapter 100 – Secrecy, Access, National Security, and Foreign Filing': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0100.pdf',
-    'Chapter 200 – Types and Status of Application; Benefit and Priority Claims': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0200.pdf',
-    'Chapter 300 – Ownership and Assignment': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0300.pdf',
-    'Chapter 400 – Representative of Applicant or Owner': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0400.pdf',
-    'Chapter 500 – Receipt and Handling of Mail and Papers': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0500.pdf',
-    'Chapter 600 – Parts, Form, and Content of Application': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0600.pdf',
-    'Chapter 700 – Examination of Applications': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0700.pdf',
-    'Chapter 800 – Restriction in Applications Filed Under 35 U.S.C. 111; Double Patenting': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0800.pdf',
-    'Chapter 900 – Prior Art, Search, Classification, and Routing': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-0900.pdf',
-    'Chapter 1000 – Matters Decided by Various U.S. Patent and Trademark Office Officials': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1000.pdf',
-    'Chapter 1100 – Statutory Invention Registration (SIR); Pre-Grant Publication (PGPub) and Preissuance Submissions': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1100.pdf',
-    'Chapter 1200 – Appeal': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1200.pdf',
-    'Chapter 1300 – Allowance and Issue': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1300.pdf',
-    'Chapter 1400 – Correction of Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1400.pdf',
-    'Chapter 1500 – Design Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1500.pdf',
-    'Chapter 1600 – Plant Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1600.pdf',
-    'Chapter 1700 – Miscellaneous': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1700.pdf',
-    'Chapter 1800 – Patent Cooperation Treaty': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1800.pdf',
-    'Chapter 1900 – Protest': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-1900.pdf',
-    'Chapter 2000 – Duty of Disclosure': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2000.pdf',
-    'Chapter 2100 – Patentability': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2100.pdf',
-    'Chapter 2200 – Citation of Prior Art and Ex Parte Reexamination of Patents': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2200.pdf',
-    'Chapter 2300 – Interference and Derivation Proceedings': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2300.pdf',
-    'Chapter 2400 – Biotechnology': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2400.pdf',
-    'Chapter 2500 – Maintenance Fees': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2500.pdf',
-    'Chapter 2600 – Optional Inter Partes Reexamination': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2600.pdf',
-    'Chapter 2700 – Patent Terms, Adjustments, and Extensions': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2700.pdf',
-    'Chapter 2800 – Supplemental Examination': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2800.pdf',
-    'Chapter 2900 – International Design Applications': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-2900.pdf',
-    'Chapter 9005 – Appendix I – Reserved': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9005-appx-i.pdf',
-    'Chapter 9010 – Appendix II – List of Decisions Cited': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9010-appx-ii.pdf',
-    'Chapter 9015 – Appendix L – Patent Laws': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9015-appx-l.pdf',
-    'Chapter 9020 – Appendix R – Patent Rules': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9020-appx-r.pdf',
-    'Chapter 9025 – Appendix T – Patent Cooperation Treaty': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9025-appx-t.pdf',
-    'Chapter 9030 – Appendix AI – Administrative Instructions Under the PCT': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9030-appx-ai.pdf',
-    'Chapter 9035 – Appendix P – Paris Convention': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9035-appx-p.pdf',
-    'Chapter 9090 – Subject Matter Index': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9090-subject-matter-index.pdf',
-    'Chapter 9095 – Form Paragraphs': 'https://www.uspto.gov/web/offices/pac/mpep/mpep-9095-Form-Paragraph-Chapter.pdf'
-}
-
-chapter_names = list(chapter_to_url.keys())
-
-
-
 # --- Chapter Auto-Suggestion ---
+# Runs on every rerun with the current question; cache across reruns and sessions
+@st.cache_data(show_spinner=False, max_entries=1024)
 def auto_detect_chapters(question):
-    keyword_to_chapter = {
-        # --- Patentability & Rejections ---
-        "101": "Chapter 2100 – Patentability",
-        "section 101": "Chapter 2100 – Patentability",
-        "section 102": "Chapter 2100 – Patentability",
-        "section 103": "Chapter 2100 – Patentability",
-        "35 usc 102": "Chapter 2100 – Patentability",
-        "35 usc 103": "Chapter 2100 – Patentability",
-        "obviousness": "Chapter 2100 – Patentability",
-        "non-obvious": "Chapter 2100 – Patentability",
-        "novelty": "Chapter 2100 – Patentability",
-        "enablement": "Chapter 2100 – Patentability",
-        "written description": "Chapter 2100 – Patentability",
-        "best mode": "Chapter 2100 – Patentability",
-        "utility": "Chapter 2100 – Patentability",
-        "abstract idea": "Chapter 2100 – Patentability",
-        "statutory subject matter": "Chapter 2100 – Patentability",
-        "algorithm": "Chapter 2100 – Patentability",
-        "103 rejection": "Chapter 2100 – Patentability",
-        "102 rejection": "Chapter 2100 – Patentability",
-
-        # --- Examination ---
-        "office action": "Chapter 700 – Examination of Applications",
-        "final rejection": "Chapter 700 – Examination of Applications",
-        "non-final rejection": "Chapter 700 – Examination of Applications",
-        "amendment": "Chapter 700 – Examination of Applications",
-        "examination": "Chapter 700 – Examination of Applications",
-        "reply brief": "Chapter 700 – Examination of Applications",
-        "interview": "Chapter 700 – Examination of Applications",
-
-        # --- Filing and Specification ---
-        "claims": "Chapter 600 – Parts, Form, and Content of Application",
-        "abstract": "Chapter 600 – Parts, Form, and Content of Application",
-        "drawings": "Chapter 600 – Parts, Form, and Content of Application",
-        "specification": "Chapter 600 – Parts, Form, and Content of Application",
-
-        # --- Restriction & Double Patenting ---
-        "restriction requirement": "Chapter 800 – Restriction in Applications Filed Under 35 U.S.C. 111; Double Patenting",
-        "double patenting": "Chapter 800 – Restriction in Applications Filed Under 35 U.S.C. 111; Double Patenting",
-        "generic claim": "Chapter 800 – Restriction in Applications Filed Under 35 U.S.C. 111; Double Patenting",
-        "unity of invention": "Chapter 800 – Restriction in Applications Filed Under 35 U.S.C. 111; Double Patenting",
-
-        # --- Application Types ---
-        "continuation": "Chapter 200 – Types and Status of Application; Benefit and Priority Claims",
-        "continuation-in-part": "Chapter 200 – Types and Status of Application; Benefit and Priority Claims",
-        "divisional": "Chapter 200 – Types and Status of Application; Benefit and Priority Claims",
-        "provisional application": "Chapter 200 – Types and Status of Application; Benefit and Priority Claims",
-        "priority claim": "Chapter 200 – Types and Status of Application; Benefit and Priority Claims",
-
-        # --- Appeals ---
-        "appeal": "Chapter 1200 – Appeal",
-        "ptab": "Chapter 1200 – Appeal",
-        "board of appeals": "Chapter 1200 – Appeal",
-        "rehearing": "Chapter 1200 – Appeal",
-        "pre-appeal": "Chapter 1200 – Appeal",
-
-        # --- Disclosure Requirements ---
-        "ids": "Chapter 2000 – Duty of Disclosure",
-        "information disclosure statement": "Chapter 2000 – Duty of Disclosure",
-        "duty of disclosure": "Chapter 2000 – Duty of Disclosure",
-        "rule 56": "Chapter 2000 – Duty of Disclosure",
-
-        # --- Prior Art & Reexamination ---
-        "prior art": "Chapter 2200 – Citation of Prior Art and Ex Parte Reexamination of Patents",
-        "non-patent literature": "Chapter 2200 – Citation of Prior Art and Ex Parte Reexamination of Patents",
-        "reexamination": "Chapter 2200 – Citation of Prior Art and Ex Parte Reexamination of Patents",
-        "ex parte": "Chapter 2200 – Citation of Prior Art and Ex Parte Reexamination of Patents",
-
-        # --- International Filing ---
-        "pct": "Chapter 1800 – Patent Cooperation Treaty",
-        "pct application": "Chapter 1800 – Patent Cooperation Treaty",
-        "foreign filing": "Chapter 1800 – Patent Cooperation Treaty",
-        "foreign filing license": "Chapter 1800 – Patent Cooperation Treaty",
-        "wipo": "Chapter 1800 – Patent Cooperation Treaty",
-        "national phase": "Chapter 1800 – Patent Cooperation Treaty",
-        "international phase": "Chapter 1800 – Patent Cooperation Treaty",
-
-        # --- Design & Plant Patents ---
-        "design patent": "Chapter 1500 – Design Patents",
-        "ornamental": "Chapter 1500 – Design Patents",
-        "plant patent": "Chapter 1600 – Plant Patents",
-
-        # --- Correction & Reissue ---
-        "reissue": "Chapter 1400 – Correction of Patents",
-        "re-issue": "Chapter 1400 – Correction of Patents",
-
-        # --- Assignments ---
-        "assignment": "Chapter 300 – Ownership and Assignment",
-        "ownership": "Chapter 300 – Ownership and Assignment",
-        "change of ownership": "Chapter 300 – Ownership and Assignment",
-
-        # --- Representation & Power of Attorney ---
-        "power of attorney": "Chapter 400 – Representative of Applicant or Owner",
-        "attorney": "Chapter 400 – Representative of Applicant or Owner",
-        "attorney of record": "Chapter 400 – Representative of Applicant or Owner",
-
-        # --- Secrecy & National Security ---
-        "secrecy order": "Chapter 100 – Secrecy, Access, National Security, and Foreign Filing",
-        "classified": "Chapter 100 – Secrecy, Access, National Security, and Foreign Filing",
-        "access to application": "Chapter 100 – Secrecy, Access, National Security, and Foreign Filing",
-
-        # --- Biotechnology ---
-        "deposit": "Chapter 2400 – Biotechnology",
-        "biological material": "Chapter 2400 – Biotechnology",
-
-        # --- Publication & Pre-Grant Disclosure ---
-        "publication": "Chapter 1100 – Statutory Invention Registration (SIR); Pre-Grant Publication (PGPub)",
-        "pre-grant": "Chapter 1100 – Statutory Invention Registration (SIR); Pre-Grant Publication (PGPub)",
-        "sir": "Chapter 1100 – Statutory Invention Registration (SIR); Pre-Grant Publication (PGPub)",
-
-        # --- Protests & Petitions ---
-        "protest": "Chapter 1900 – Protest",
-        "petition": "Chapter 1000 – Matters Decided by Various U.S. Patent and Trademark Office Officials",
-
-        # --- Fees ---
-        "maintenance fee": "Chapter 2500 – Maintenance Fees",
-        "fee payment": "Chapter 2500 – Maintenance Fees",
-        "late fee": "Chapter 2500 – Maintenance Fees",
-
-        # --- Misc & Index ---
-        "subject matter index": "Chapter 9090 – Subject Matter Index"
-    }
-
-    question_lower = question.lower()
-    for keyword, chapter in keyword_to_chapter.items():
-        if keyword in question_lower:
-            return chapter
+    match = keyword_pattern.search(question)
+    if match:
+        return code_to_chapter.get(keyword_to_code[match.group(0).lower()])
     return None
 
 
 # === Part 4: PDF Processing and Embedding ===
 
-@st.cache_data(show_spinner="📄 Loading and extracting MPEP PDF...")
+# Extracted text is also kept on disk so restarts and redeploys skip the download and parse
+@st.cache_resource
+def get_text_cache():
+    return diskcache.Cache(".pdfcache")
+
+# In memory, bounded and expiring with the disk copy; the disk layers below survive restarts.
+# No spinner: this runs on fetch threads, under the search button's spinner.
+@st.cache_data(ttl=timedelta(days=7), max_entries=64, show_spinner=False)
 def get_text_from_pdf_url(url):
+    # Shipped text assets first, then the disk cache, then the PDF itself
+    text = load_chapter_asset(url)
+    if text is not None:
+        return text
+    text_cache = get_text_cache()
+    text = text_cache.get(url)
+    if text is not None:
+        return text
+    # Errors propagate so st.cache_data doesn't memoize a failed download
+    response = get_http_session().get(url, timeout=download_timeout)
+    response.raise_for_status()
+    text = extract_pdf_text(response.content)
+    text_cache.set(url, text, expire=timedelta(days=7).total_seconds())
+    return text
+
+def fetch_chapter_text(url):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        with BytesIO(response.content) as f:
-            doc = fitz.open(stream=f.read(), filetype="pdf")
-            return "\n".join(page.get_text() for page in doc)
+        return get_text_from_pdf_url(url)
     except Exception as e:
         return f"[Error loading PDF] {e}"
 
+def fetch_chapter_texts(chapters):
+    # Download the selected chapters concurrently; the workers write no Streamlit elements
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        texts = list(executor.map(fetch_chapter_text, [chapter_to_url[c] for c in chapters]))
+    return dict(zip(chapters, texts))
+
+def paragraph_spans(full_text):
+    # (start, end) offsets of each stripped paragraph long enough to be worth searching
+    spans = []
+    start = 0
+    for block in full_text.split("\n\n"):
+        stripped = block.strip()
+        if len(stripped) > 100:
+            lead = start + len(block) - len(block.lstrip())
+            spans.append((lead, lead + len(stripped)))
+        start += len(block) + 2
+    return spans
+
+# Late chunking: run the transformer over the whole chapter in overlapping windows and
+# mean-pool the contextual token embeddings that fall inside each paragraph.
+late_chunk_window = model.max_seq_length - 2  # room for [CLS] and [SEP]
+late_chunk_stride = late_chunk_window * 3 // 4
+
+def compute_paragraph_embeddings(full_text, spans, batch_size=32):
+    transformer = model[0]
+    tokenizer = transformer.tokenizer
+    encoded = tokenizer(full_text, add_special_tokens=False, return_offsets_mapping=True)
+    token_ids = encoded["input_ids"]
+    token_starts = [offset[0] for offset in encoded["offset_mapping"]]
+
+    # Map every token to the paragraph it belongs to (-1 for text between paragraphs)
+    token_paragraph = torch.full((len(token_ids),), -1, dtype=torch.long, device=device)
+    for i, (start, end) in enumerate(spans):
+        lo = bisect.bisect_left(token_starts, start)
+        hi = bisect.bisect_left(token_starts, end)
+        token_paragraph[lo:hi] = i
+
+    starts = list(range(0, max(len(token_ids) - late_chunk_window, 0) + late_chunk_stride, late_chunk_stride))
+    # Skip windows with no paragraph tokens (TOC/index pages can be mostly uncovered text)
+    starts = [i for i in starts if (token_paragraph[i:i + late_chunk_window] >= 0).any()]
+
+    hidden_size = transformer.auto_model.config.hidden_size
+    with torch.inference_mode():
+        sums = torch.zeros(len(spans), hidden_size, device=device)
+        counts = torch.zeros(len(spans), 1, device=device)
+        for b in range(0, len(starts), batch_size):
+            batch_starts = starts[b:b + batch_size]
+            windows = [token_ids[i:i + late_chunk_window] for i in batch_starts]
+            longest = max(len(w) for w in windows)
+            input_ids = torch.full((len(windows), longest + 2), tokenizer.pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros_like(input_ids)
+            for row, w in enumerate(windows):
+                input_ids[row, :len(w) + 2] = torch.tensor([tokenizer.cls_token_id, *w, tokenizer.sep_token_id])
+                attention_mask[row, :len(w) + 2] = 1
+            hidden = transformer.auto_model(
+                input_ids=input_ids.to(device),
+                attention_mask=attention_mask.to(device)
+            ).last_hidden_state
+
+            for row, (i, w) in enumerate(zip(batch_starts, windows)):
+                owners = token_paragraph[i:i + len(w)]
+                inside = owners >= 0
+                sums.index_add_(0, owners[inside], hidden[row, 1:len(w) + 1][inside])
+                counts.index_add_(0, owners[inside], torch.ones(int(inside.sum()), 1, device=device))
+
+    return torch.nn.functional.normalize(sums / counts.clamp(min=1), dim=-1)
+
+# Embeddings are persisted as raw float16 and memory-mapped, so only the rows being
+# scanned are paged in and nothing is deserialized or copied per query
+embedding_cache_dir = ".embedding_cache"
+
+@st.cache_resource(show_spinner=False)
+def embed_chapter(full_text):
+    spans = paragraph_spans(full_text)
+    paragraphs = [full_text[start:end] for start, end in spans]
+    if not spans:
+        return paragraphs, None
+
+    dim = model.get_sentence_embedding_dimension()
+    # Anything that changes the vectors must change the file name, or stale ones are served
+    fingerprint = f"{embedder_name}|{late_chunk_window}|{late_chunk_stride}|{dim}\n"
+    key = hashlib.sha1((fingerprint + full_text).encode("utf-8")).hexdigest()
+    path = os.path.join(embedding_cache_dir, f"{key}.f16")
+    if not os.path.exists(path):
+        embeddings = compute_paragraph_embeddings(full_text, spans)
+        os.makedirs(embedding_cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        embeddings.cpu().numpy().astype(np.float16).tofile(tmp_path)
+        os.replace(tmp_path, path)
+    return paragraphs, np.memmap(path, dtype=np.float16, mode="r", shape=(len(spans), dim))
+
+# The script re-executes on every rerun, so an lru_cache here would start empty each time
+@st.cache_resource(show_spinner=False, max_entries=256)
+def embed_query(query):
+    with torch.inference_mode():
+        embedding = model.encode(query, convert_to_tensor=True, normalize_embeddings=True)
+    return embedding.cpu().numpy().astype(np.float32)
+
+def cosine_scores(query_embedding, embeddings, block_size=8192):
+    # Both sides are L2-normalised, so a dot product is the cosine similarity
+    scores = np.empty(len(embeddings), dtype=np.float32)
+    for i in range(0, len(embeddings), block_size):
+        scores[i:i + block_size] = embeddings[i:i + block_size].astype(np.float32) @ query_embedding
+    return scores
+
 def get_top_matches(query, chapter_texts, top_k=1):
     results = []
+    query_embedding = embed_query(query)
     for chapter, full_text in chapter_texts.items():
-        paragraphs = [p.strip() for p in full_text.split("\n\n") if len(p.strip()) > 100]
+        paragraphs, para_embeddings = embed_chapter(full_text)
         if not paragraphs:
             continue
-        para_embeddings = model.encode(paragraphs, convert_to_tensor=True)
-        query_embedding = model.encode(query, convert_to_tensor=True)
-        hits = util.semantic_search(query_embedding, para_embeddings, top_k=top_k)[0]
-        for hit in hits:
-            para = paragraphs[hit["corpus_id"]]
-            score = hit["score"]
-            results.append((chapter, para, score))
+        scores = cosine_scores(query_embedding, para_embeddings)
+        k = min(top_k, len(scores))
+        for idx in np.argpartition(-scores, k - 1)[:k]:
+            results.append((chapter, paragraphs[idx], float(scores[idx])))
     return sorted(results, key=lambda x: -x[2])
 
 # === Part 5: UI Inputs and Model Selection ===
@@ -366,6 +367,10 @@ available_models = {
     "DeepHermes 3 LLaMA 3 8B Preview (OpenRouter)": {
         "id": "nousresearch/deephermes-3-llama-3-8b-preview:free",
         "source": "openrouter"
+    },
+    "Mistral 7B (Hugging Face)": {
+        "id": "mistralai/Mistral-7B-Instruct-v0.1",
+        "source": "huggingface"
     }
 }
 
@@ -392,6 +397,22 @@ selected_chapters = st.multiselect(
 
 # === Part 6: Query LLM with Fallback & Proper API Handling ===
 
+# Clean, structured prompt. The instructions and chapter context come first and the
+# question last, so providers that cache prompt prefixes can reuse the encoded context
+# when another question is asked against the same chapters.
+def build_prompt(question, context):
+    return f"""
+Using the following text from the MPEP chapter(s), answer the user's question concisely and clearly. Do not repeat the question or the full context.
+
+MPEP context:
+{context}
+
+User question:
+{question}
+
+Answer:
+""".strip()
+
 def query_llm(prompt, primary_model_name):
     if primary_model_name not in available_models:
         return {"error": f"Unknown model selected: {primary_model_name}"}
@@ -409,19 +430,18 @@ def query_llm(prompt, primary_model_name):
                 key = st.secrets.get("HUGGINGFACE_API_KEY")
                 if not key:
                     return {"error": "Missing Hugging Face API key"}
-                url = f"https://api-inference.huggingface.co/models/{model_id}"
-                headers = {"Authorization": f"Bearer {key}"}
-                payload = {
-                    "inputs": prompt,
-                    "parameters": {"max_new_tokens": 300}
-                }
-                r = requests.post(url, headers=headers, json=payload)
-                if r.status_code != 200:
-                    return {"error": f"Hugging Face error: {r.status_code}", "raw": r.text}
-                data = r.json()
-                if isinstance(data, list) and "generated_text" in data[0]:
-                    return {"output": data[0]["generated_text"], "model": model_id}
-                return {"error": "Unexpected HF output format", "raw": data}
+                client = InferenceClient(model=model_id, token=key, timeout=llm_timeout[1])
+                stream = client.text_generation(prompt, max_new_tokens=300, stream=True)
+
+                # Show tokens as they arrive; the formatted answer replaces them below
+                placeholder = st.empty()
+                try:
+                    with placeholder.container():
+                        output = st.write_stream(stream)
+                finally:
+                    # Also clear partial tokens if the stream fails midway
+                    placeholder.empty()
+                return {"output": output, "model": model_id}
 
             elif source == "openrouter":
                 key = st.secrets.get("OPENROUTER_API_KEY")
@@ -440,7 +460,7 @@ def query_llm(prompt, primary_model_name):
                     "messages": [{"role": "user", "content": prompt}]
                 }
             
-                r = requests.post(url, headers=headers, data=json.dumps(payload))
+                r = get_http_session().post(url, headers=headers, data=json.dumps(payload), timeout=llm_timeout)
 
                 if r.status_code == 402:
                     return {"error": "OpenRouter: Insufficient credits", "raw": r.text}
@@ -467,36 +487,116 @@ def query_llm(prompt, primary_model_name):
     return result_fallback if "output" in result_fallback else {"error": "Both models failed", "details": result_fallback}
 
 
+# --- Answer Cache ---
+# Two layers, both keyed on the model and the retrieved context:
+# - within a session, a close paraphrase (cosine >= 0.87) of an earlier question reuses
+#   its answer;
+# - across sessions, an answer from the last hour is reused only for the exact same
+#   question text, since near-identical legal questions ("final" vs "non-final
+#   rejection") embed above the paraphrase threshold.
+answer_cache_threshold = 0.87
+answer_cache_size = 1000
+answer_cache_ttl = timedelta(hours=1).total_seconds()
+
+@st.cache_resource
+def get_shared_answer_cache():
+    return {"entries": {}, "lock": threading.Lock()}
+
+def context_digest(context):
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+def normalize_question(query):
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+def lookup_cached_answer(query, context, model_name):
+    context_key = context_digest(context)
+
+    shared = get_shared_answer_cache()
+    shared_key = (normalize_question(query), context_key, model_name)
+    with shared["lock"]:
+        hit = shared["entries"].get(shared_key)
+        if hit is not None and time.time() - hit["created"] < answer_cache_ttl:
+            return hit["result"]
+
+    cache = st.session_state["answer_cache"]
+    candidates = [
+        i for i, entry in enumerate(cache)
+        if entry["context"] == context_key and entry["model"] == model_name
+    ]
+    if not candidates:
+        return None
+    scores = np.stack([cache[i]["embedding"] for i in candidates]) @ embed_query(query)
+    best = int(np.argmax(scores))
+    if scores[best] < answer_cache_threshold:
+        return None
+    # Move the hit to the end so eviction drops the least recently used entry
+    entry = cache.pop(candidates[best])
+    cache.append(entry)
+    return entry["result"]
+
+def store_cached_answer(query, context, model_name, result):
+    context_key = context_digest(context)
+
+    cache = st.session_state["answer_cache"]
+    cache.append({
+        "embedding": embed_query(query),
+        "context": context_key,
+        "model": model_name,
+        "result": result
+    })
+    if len(cache) > answer_cache_size:
+        cache.pop(0)
+
+    shared = get_shared_answer_cache()
+    with shared["lock"]:
+        entries = shared["entries"]
+        now = time.time()
+        for key in [k for k, v in entries.items() if now - v["created"] >= answer_cache_ttl]:
+            del entries[key]
+        key = (normalize_question(query), context_key, model_name)
+        entries.pop(key, None)
+        entries[key] = {"result": result, "created": now}
+        # Dicts keep insertion order, so the first key is the oldest entry
+        if len(entries) > answer_cache_size:
+            del entries[next(iter(entries))]
+
+
 # === Part 7: Execute Search, Query Model, and Display Answer ===
 
+max_context_chars = 15000
+
 if st.button("🔍 Search") and query and selected_chapters:
     with st.spinner("🔍 Retrieving relevant text and analyzing..."):
         # Load and extract relevant text
-        chapter_texts = {c: get_text_from_pdf_url(chapter_to_url[c]) for c in selected_chapters}
+        chapter_texts = fetch_chapter_texts(selected_chapters)
         top_matches = get_top_matches(query, chapter_texts, top_k=1)
 
         if not top_matches:
             st.error("❌ No relevant text found in selected chapters.")
             st.stop()
 
-        # Build context from top paragraphs
-        context = "\n---\n".join(f"{chap}\n{para}" for chap, para, _ in top_matches)
-
-        # Clean, structured prompt
-        prompt = f"""
-Using the following text from the MPEP chapter(s), answer the user's question concisely and clearly. Do not repeat the question or the full context.
-
-User question:
-{query}
-
-MPEP context:
-{context}
-
-Answer:
-""".strip()
-
-        # Call LLM
-        result = query_llm(prompt, model_name)
+        # Build context from top paragraphs, best match first, stopping at the size budget
+        # (PDFs without blank lines between paragraphs can yield very long "paragraphs")
+        context_parts = []
+        remaining = max_context_chars
+        for chap, para, _ in top_matches:
+            if remaining <= 0:
+                break
+            part = f"{chap}\n{para}"[:remaining]
+            context_parts.append(part)
+            remaining -= len(part)
+        context = "\n---\n".join(context_parts)
+
+        prompt = build_prompt(query, context)
+
+        # Call LLM, unless a similar question was already answered from the same context
+        cached_result = lookup_cached_answer(query, context, model_name)
+        if cached_result is not None:
+            result = {**cached_result, "cached": True}
+        else:
+            result = query_llm(prompt, model_name)
+            if "output" in result:
+                store_cached_answer(query, context, model_name, result)
 
         # --- Debug Output ---
         with st.expander("🐞 Debug Output (developer view)", expanded=False):
@@ -528,6 +628,8 @@ Answer:
 
     # --- Display Final Answer ---
     st.markdown("## 💡 AI Answer")
+    if result.get("cached"):
+        st.caption("⚡ (cached) Reused the answer to a similar earlier question.")
     def play_success_sound():
         st.markdown("""
             <audio autoplay>
@@ -578,25 +680,3 @@ if st.session_state["last_query"] and st.session_state["last_answer"]:
 
     st.markdown(generate_download(export_txt, f"mpe_edge_answer_{now}.txt", "txt"), unsafe_allow_html=True)
     st.markdown(generate_download(export_md, f"mpe_edge_answer_{now}.md", "markdown"), unsafe_allow_html=True)
-
-# === Part 10: Performance Optimizations ===
-
-@st.cache_data(show_spinner=False)
-def cache_embeddings(text_list):
-    return model.encode(text_list, convert_to_tensor=True)
-
-def get_top_matches_optimized(query, chapter_texts, top_k=1):
-    results = []
-    query_embedding = model.encode(query, convert_to_tensor=True)
-
-    for chapter, text in chapter_texts.items():
-        paras = [p.strip() for p in text.split("\n\n") if len(p.strip()) > 100]
-        if not paras:
-            continue
-        para_embeddings = cache_embeddings(paras)
-        hits = util.semantic_search(query_embedding, para_embeddings, top_k=top_k)[0]
-        for hit in hits:
-            para = paras[hit["corpus_id"]]
-            results.append((chapter, para, hit["score"]))
-
-    return sorted(results, key=lambda x: -x[2])